@@ -1,32 +1,50 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, HTTPException, Request
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
 from dotenv import load_dotenv
+from starlette.background import BackgroundTask
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import AsyncMongoClient, InsertOne, ReturnDocument, UpdateMany, UpdateOne
+from pymongo.errors import OperationFailure
+from cachetools import LRUCache, TTLCache
 import os
+import asyncio
+import hashlib
 import logging
+import queue
+import orjson
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, ConfigDict, Field
+from typing import List, Optional, Dict, Any, ClassVar
+from typing_extensions import TypedDict
 import uuid
 from datetime import datetime, date, timedelta
 from enum import Enum
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener
 from emergentintegrations.llm.chat import LlmChat, UserMessage
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# MongoDB connection; one client per process, with a pool sized for this small app
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncMongoClient(
+    mongo_url,
+    maxPoolSize=50,
+    minPoolSize=5,
+    maxIdleTimeMS=60000,
+    serverSelectionTimeoutMS=2000,
+)
 db = client[os.environ['DB_NAME']]
 
-# Create the main app without a prefix
-app = FastAPI()
+# Create the main app without a prefix; responses are encoded with orjson
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
 # Utility function to convert date to datetime for MongoDB compatibility
+@lru_cache(maxsize=2048)
 def date_to_datetime(d: date) -> datetime:
     """Convert date to datetime for MongoDB BSON compatibility"""
     return datetime(d.year, d.month, d.day)
@@ -35,6 +53,10 @@ def datetime_to_date(dt: datetime) -> date:
     """Convert datetime back to date"""
     return dt.date()
 
+def set_on_insert(doc: dict, update_fields: dict) -> dict:
+    """Fields of a new document for $setOnInsert, minus those the accompanying $set writes"""
+    return {k: v for k, v in doc.items() if k not in update_fields}
+
 # Enums
 class DrinkType(str, Enum):
     WASSER = "wasser"
@@ -43,6 +65,14 @@ class DrinkType(str, Enum):
     WASSERKUR = "wasserkur"
     KAFFEE = "kaffee"
 
+# Per-day drink counts keyed by DrinkType value (fixed key set, plain str keys)
+class DrinkCounts(TypedDict, total=False):
+    wasser: int
+    abnehmkaffee: int
+    ingwer_knoblauch_tee: int
+    wasserkur: int
+    kaffee: int
+
 class PillTime(str, Enum):
     MORNING = "morning"
     EVENING = "evening"
@@ -60,69 +90,73 @@ class ChatCategory(str, Enum):
     ALLGEMEIN = "allgemein"
 
 # Models
-class PillTracking(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    date: date
-    morning_taken: bool = False
-    evening_taken: bool = False
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
+class DateBSONModel(BaseModel):
+    """Base for models stored in MongoDB, whose `date` fields are kept as BSON datetimes"""
+    # Names of the `date` fields, collected once when the subclass is created
+    _date_fields: ClassVar[tuple] = ()
+    
+    @classmethod
+    def __pydantic_init_subclass__(cls, **kwargs):
+        super().__pydantic_init_subclass__(**kwargs)
+        cls._date_fields = tuple(
+            name for name, field in cls.model_fields.items() if field.annotation is date
+        )
     
     def to_mongo(self):
         """Convert to MongoDB-compatible format"""
-        data = self.dict()
-        data['date'] = date_to_datetime(self.date)
+        data = self.__dict__.copy()
+        for name in self._date_fields:
+            data[name] = date_to_datetime(data[name])
         return data
     
     @classmethod
     def from_mongo(cls, data):
-        """Create from MongoDB data"""
-        if data and 'date' in data:
-            data['date'] = datetime_to_date(data['date'])
-        return cls(**data)
-
-class DrinkTracking(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    date: date
-    drinks: Dict[DrinkType, int] = Field(default_factory=dict)
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
+        """Create from trusted MongoDB data without re-validating"""
+        if data:
+            for name in cls._date_fields:
+                if name in data:
+                    data[name] = datetime_to_date(data[name])
+        return cls.model_construct(**data)
     
-    def to_mongo(self):
-        """Convert to MongoDB-compatible format"""
-        data = self.dict()
-        data['date'] = date_to_datetime(self.date)
+    @classmethod
+    def json_doc(cls, data):
+        """Convert one trusted MongoDB document in place so it can be returned as JSON directly"""
+        for name in cls._date_fields:
+            if name in data:
+                data[name] = datetime_to_date(data[name])
         return data
     
     @classmethod
-    def from_mongo(cls, data):
-        """Create from MongoDB data"""
-        if data and 'date' in data:
-            data['date'] = datetime_to_date(data['date'])
-        return cls(**data)
+    def json_docs(cls, docs):
+        """Convert a list of trusted MongoDB documents in place, see json_doc"""
+        for data in docs:
+            cls.json_doc(data)
+        return docs
+
+class PillTracking(DateBSONModel):
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex)
+    date: date
+    morning_taken: bool = False
+    evening_taken: bool = False
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+class DrinkTracking(DateBSONModel):
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex)
+    date: date
+    drinks: DrinkCounts = Field(default_factory=dict)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
 
-class WeightEntry(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+class WeightEntry(DateBSONModel):
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex)
     date: date
     weight: float  # in kg with decimals
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
-    
-    def to_mongo(self):
-        """Convert to MongoDB-compatible format"""
-        data = self.dict()
-        data['date'] = date_to_datetime(self.date)
-        return data
-    
-    @classmethod
-    def from_mongo(cls, data):
-        """Create from MongoDB data"""
-        if data and 'date' in data:
-            data['date'] = datetime_to_date(data['date'])
-        return cls(**data)
 
-class WeightGoal(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+class WeightGoal(DateBSONModel):
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex)
     goal_type: GoalType
     start_weight: float
     target_weight: Optional[float] = None
@@ -133,25 +167,17 @@ class WeightGoal(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     
-    def to_mongo(self):
-        """Convert to MongoDB-compatible format"""
-        data = self.dict()
-        data['start_date'] = date_to_datetime(self.start_date)
-        data['target_date'] = date_to_datetime(self.target_date)
-        return data
-    
     @classmethod
     def from_mongo(cls, data):
-        """Create from MongoDB data"""
-        if data:
-            if 'start_date' in data:
-                data['start_date'] = datetime_to_date(data['start_date'])
-            if 'target_date' in data:
-                data['target_date'] = datetime_to_date(data['target_date'])
-        return cls(**data)
+        """Create from trusted MongoDB data without re-validating"""
+        if data and 'goal_type' in data:
+            data['goal_type'] = GoalType(data['goal_type'])
+        return super().from_mongo(data)
 
 class Reminder(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    model_config = ConfigDict(frozen=True)
+    
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex)
     reminder_type: str  # 'pills_morning', 'pills_evening', 'weight', 'drinks'
     time: str  # HH:MM format
     is_enabled: bool = True
@@ -159,13 +185,15 @@ class Reminder(BaseModel):
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
 class ChatMessage(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    model_config = ConfigDict(frozen=True)
+    
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex)
     message: str
     is_user: bool
     timestamp: datetime = Field(default_factory=datetime.utcnow)
 
 class SavedChatMessage(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex)
     original_message: str
     ai_response: str
     category: ChatCategory
@@ -175,7 +203,7 @@ class SavedChatMessage(BaseModel):
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
 class UserProfile(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex)
     height: Optional[float] = None  # in cm
     age: Optional[int] = None
     gender: Optional[str] = None  # 'male', 'female', 'other'
@@ -184,8 +212,8 @@ class UserProfile(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
-class WaterIntake(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+class WaterIntake(DateBSONModel):
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex)
     date: date
     glasses_consumed: int = 0
     ml_per_glass: int = 250
@@ -193,22 +221,11 @@ class WaterIntake(BaseModel):
     daily_goal_ml: int = 2000  # Default 2L
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
-    
-    def to_mongo(self):
-        """Convert to MongoDB-compatible format"""
-        data = self.dict()
-        data['date'] = date_to_datetime(self.date)
-        return data
-    
-    @classmethod
-    def from_mongo(cls, data):
-        """Create from MongoDB data"""
-        if data and 'date' in data:
-            data['date'] = datetime_to_date(data['date'])
-        return cls(**data)
 
 class Achievement(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    model_config = ConfigDict(frozen=True)
+    
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex)
     user_id: str = "default"  # For multi-user support later
     badge_type: str  # 'pills_streak', 'water_goal', 'weight_consistency', etc.
     title: str
@@ -223,7 +240,7 @@ class Achievement(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 class UserStats(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex)
     user_id: str = "default"
     total_xp: int = 0
     current_level: int = 1
@@ -237,7 +254,7 @@ class UserStats(BaseModel):
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
 class NotificationSettings(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex)
     user_id: str = "default"
     morning_pills_time: str = "08:00"
     evening_pills_time: str = "20:00"
@@ -249,7 +266,7 @@ class NotificationSettings(BaseModel):
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
 class AppSettings(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex)
     user_id: str = "default"
     theme: str = "pink"  # 'pink', 'blue', 'green'
     language: str = "de"
@@ -260,7 +277,7 @@ class AppSettings(BaseModel):
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
 class HealthInsight(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex)
     user_id: str = "default"
     insight_type: str  # 'pattern', 'prediction', 'recommendation', 'warning'
     title: str
@@ -271,7 +288,7 @@ class HealthInsight(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 class HealthChatSession(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex)
     session_id: str
     messages: List[ChatMessage] = Field(default_factory=list)
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -294,7 +311,7 @@ class PillUpdate(BaseModel):
 
 class DrinkTrackingCreate(BaseModel):
     date: date
-    drinks: Dict[DrinkType, int] = Field(default_factory=dict)
+    drinks: DrinkCounts = Field(default_factory=dict)
 
 class DrinkUpdate(BaseModel):
     drink_type: DrinkType
@@ -360,336 +377,348 @@ class AppSettingsUpdate(BaseModel):
     analytics_enabled: Optional[bool] = None
 
 # Achievement System Utilities
-def initialize_default_achievements():
-    """Initialize default achievement badges - Expanded system up to Level 100"""
-    return [
-        # === BASIC ACHIEVEMENTS (Level 1-20) ===
-        {
-            "badge_type": "pills_streak_7",
-            "title": "💊 Pillen-Profi",
-            "description": "7 Tage alle Tabletten genommen",
-            "icon": "medical",
-            "color": "#4CAF50",
-            "xp_reward": 100,
-            "requirement_count": 7
-        },
-        {
-            "badge_type": "water_streak_5",
-            "title": "💧 Wasserdrache", 
-            "description": "5 Tage Wasserziel erreicht",
-            "icon": "water",
-            "color": "#2196F3",
-            "xp_reward": 75,
-            "requirement_count": 5
-        },
-        {
-            "badge_type": "weight_consistency_10",
-            "title": "📈 Gewichts-Warrior",
-            "description": "10 Gewichtseinträge in Folge",
-            "icon": "trending-up",
-            "color": "#9C27B0",
-            "xp_reward": 150,
-            "requirement_count": 10
-        },
-        {
-            "badge_type": "coffee_control_7",
-            "title": "☕ Kaffee-Kontrolle",
-            "description": "Eine Woche unter 6 Kaffees/Tag",
-            "icon": "cafe",
-            "color": "#FF9800",
-            "xp_reward": 80,
-            "requirement_count": 7
-        },
-        {
-            "badge_type": "first_week",
-            "title": "🌟 Erste Schritte",
-            "description": "7 Tage die App verwendet",
-            "icon": "star",
-            "color": "#FFD700",
-            "xp_reward": 50,
-            "requirement_count": 7
-        },
-        
-        # === INTERMEDIATE ACHIEVEMENTS (Level 20-50) ===
-        {
-            "badge_type": "pills_streak_30",
-            "title": "💊 Pillen-Meister",
-            "description": "30 Tage alle Tabletten genommen",
-            "icon": "medical",
-            "color": "#4CAF50",
-            "xp_reward": 300,
-            "requirement_count": 30
-        },
-        {
-            "badge_type": "water_streak_14",
-            "title": "💧 Aqua-Champion",
-            "description": "14 Tage Wasserziel erreicht",
-            "icon": "water",
-            "color": "#2196F3",
-            "xp_reward": 200,
-            "requirement_count": 14
-        },
-        {
-            "badge_type": "perfect_week",
-            "title": "🔥 Perfekte Woche",
-            "description": "7 Tage alle Ziele erreicht",
-            "icon": "flame",
-            "color": "#FF5722",
-            "xp_reward": 250,
-            "requirement_count": 7
-        },
-        {
-            "badge_type": "tea_lover_20",
-            "title": "🫖 Tee-Liebhaber",
-            "description": "20x Ingwer-Knoblauch-Tee getrunken",
-            "icon": "leaf",
-            "color": "#4CAF50",
-            "xp_reward": 120,
-            "requirement_count": 20
-        },
-        {
-            "badge_type": "weight_loss_2kg",
-            "title": "📉 Erste Erfolge",
-            "description": "2kg erfolgreich abgenommen",
-            "icon": "trending-down",
-            "color": "#9C27B0",
-            "xp_reward": 400,
-            "requirement_count": 2
-        },
-        
-        # === ADVANCED ACHIEVEMENTS (Level 50-75) ===
-        {
-            "badge_type": "pills_streak_100",
-            "title": "💊 Pillen-Legende", 
-            "description": "100 Tage alle Tabletten genommen",
-            "icon": "medical",
-            "color": "#4CAF50",
-            "xp_reward": 1000,
-            "requirement_count": 100
-        },
-        {
-            "badge_type": "water_streak_30",
-            "title": "💧 Hydrations-König",
-            "description": "30 Tage Wasserziel erreicht",
-            "icon": "water",
-            "color": "#2196F3",
-            "xp_reward": 500,
-            "requirement_count": 30
-        },
-        {
-            "badge_type": "perfect_month",
-            "title": "🌙 Perfekter Monat",
-            "description": "30 Tage alle Ziele erreicht",
-            "icon": "moon",
-            "color": "#9C27B0",
-            "xp_reward": 750,
-            "requirement_count": 30
-        },
-        {
-            "badge_type": "water_cure_50",
-            "title": "💦 Wasserkur-Experte",
-            "description": "50x Wasserkur durchgeführt",
-            "icon": "medical",
-            "color": "#00BCD4",
-            "xp_reward": 300,
-            "requirement_count": 50
-        },
-        {
-            "badge_type": "weight_loss_5kg",
-            "title": "📉 Großer Erfolg",
-            "description": "5kg erfolgreich abgenommen",
-            "icon": "trending-down",
-            "color": "#9C27B0",
-            "xp_reward": 800,
-            "requirement_count": 5
-        },
-        {
-            "badge_type": "early_bird_30",
-            "title": "🌅 Frühaufsteher",
-            "description": "30x vor 8:00 Uhr Gewicht eingetragen",
-            "icon": "sunny",
-            "color": "#FFC107",
-            "xp_reward": 200,
-            "requirement_count": 30
-        },
-        
-        # === EXPERT ACHIEVEMENTS (Level 75-90) ===
-        {
-            "badge_type": "streak_master_50",
-            "title": "🔥 Streak-Master",
-            "description": "50 Tage perfektes Tracking",
-            "icon": "flame",
-            "color": "#FF5722",
-            "xp_reward": 1200,
-            "requirement_count": 50
-        },
-        {
-            "badge_type": "health_guru_90",
-            "title": "⭐ Gesundheits-Guru",
-            "description": "90 Tage alle Kategorien erfüllt",
-            "icon": "star",
-            "color": "#FFD700",
-            "xp_reward": 1500,
-            "requirement_count": 90
-        },
-        {
-            "badge_type": "pills_streak_365",
-            "title": "💊 Jahres-Champion",
-            "description": "365 Tage alle Tabletten genommen",
-            "icon": "medical",
-            "color": "#4CAF50",
-            "xp_reward": 2500,
-            "requirement_count": 365
-        },
-        {
-            "badge_type": "weight_loss_10kg",
-            "title": "📉 Transformation",
-            "description": "10kg erfolgreich abgenommen",
-            "icon": "trending-down",
-            "color": "#9C27B0",
-            "xp_reward": 2000,
-            "requirement_count": 10
-        },
-        
-        # === LEGENDARY ACHIEVEMENTS (Level 90-100) ===
-        {
-            "badge_type": "perfect_100_days",
-            "title": "💎 Diamant-Status",
-            "description": "100 Tage perfektes Tracking",
-            "icon": "diamond",
-            "color": "#E1BEE7",
-            "xp_reward": 3000,
-            "requirement_count": 100
-        },
-        {
-            "badge_type": "water_master_100",
-            "title": "💧 Aqua-Legende",
-            "description": "100 Tage Wasserziel erreicht",
-            "icon": "water",
-            "color": "#2196F3",
-            "xp_reward": 2000,
-            "requirement_count": 100
-        },
-        {
-            "badge_type": "consistency_king",
-            "title": "👑 Beständigkeits-König",
-            "description": "200 Tage App-Nutzung",
-            "icon": "crown",
-            "color": "#FFD700",
-            "xp_reward": 4000,
-            "requirement_count": 200
-        },
-        {
-            "badge_type": "weight_loss_20kg",
-            "title": "🏆 Mega-Transformation",
-            "description": "20kg erfolgreich abgenommen",
-            "icon": "trophy",
-            "color": "#FF6F00",
-            "xp_reward": 5000,
-            "requirement_count": 20
-        },
-        {
-            "badge_type": "zen_master",
-            "title": "🧘 Zen-Meister",
-            "description": "365 Tage perfekte Balance",
-            "icon": "flower",
-            "color": "#9C27B0",
-            "xp_reward": 10000,
-            "requirement_count": 365
-        },
-        
-        # === SPECIAL ACHIEVEMENTS ===
-        {
-            "badge_type": "night_owl",
-            "title": "🦉 Nachteule",
-            "description": "50x nach 22:00 Uhr getrackt",
-            "icon": "moon",
-            "color": "#3F51B5",
-            "xp_reward": 150,
-            "requirement_count": 50
-        },
-        {
-            "badge_type": "weekend_warrior",
-            "title": "🌅 Wochenend-Krieger",
-            "description": "20 perfekte Wochenenden",
-            "icon": "calendar",
-            "color": "#795548",
-            "xp_reward": 300,
-            "requirement_count": 20
-        },
-        {
-            "badge_type": "chat_enthusiast",
-            "title": "💬 Chat-Enthusiast",
-            "description": "100 Nachrichten mit Gugi",
-            "icon": "chatbubbles",
-            "color": "#FF69B4",
-            "xp_reward": 200,
-            "requirement_count": 100
-        },
-        {
-            "badge_type": "knowledge_seeker",
-            "title": "📚 Wissenssammler",
-            "description": "50 Tipps gespeichert",
-            "icon": "library",
-            "color": "#607D8B",
-            "xp_reward": 250,
-            "requirement_count": 50
-        }
-    ]
+# Default achievement badges - Expanded system up to Level 100
+DEFAULT_ACHIEVEMENTS = (
+    # === BASIC ACHIEVEMENTS (Level 1-20) ===
+    {
+        "badge_type": "pills_streak_7",
+        "title": "💊 Pillen-Profi",
+        "description": "7 Tage alle Tabletten genommen",
+        "icon": "medical",
+        "color": "#4CAF50",
+        "xp_reward": 100,
+        "requirement_count": 7
+    },
+    {
+        "badge_type": "water_streak_5",
+        "title": "💧 Wasserdrache", 
+        "description": "5 Tage Wasserziel erreicht",
+        "icon": "water",
+        "color": "#2196F3",
+        "xp_reward": 75,
+        "requirement_count": 5
+    },
+    {
+        "badge_type": "weight_consistency_10",
+        "title": "📈 Gewichts-Warrior",
+        "description": "10 Gewichtseinträge in Folge",
+        "icon": "trending-up",
+        "color": "#9C27B0",
+        "xp_reward": 150,
+        "requirement_count": 10
+    },
+    {
+        "badge_type": "coffee_control_7",
+        "title": "☕ Kaffee-Kontrolle",
+        "description": "Eine Woche unter 6 Kaffees/Tag",
+        "icon": "cafe",
+        "color": "#FF9800",
+        "xp_reward": 80,
+        "requirement_count": 7
+    },
+    {
+        "badge_type": "first_week",
+        "title": "🌟 Erste Schritte",
+        "description": "7 Tage die App verwendet",
+        "icon": "star",
+        "color": "#FFD700",
+        "xp_reward": 50,
+        "requirement_count": 7
+    },
+    
+    # === INTERMEDIATE ACHIEVEMENTS (Level 20-50) ===
+    {
+        "badge_type": "pills_streak_30",
+        "title": "💊 Pillen-Meister",
+        "description": "30 Tage alle Tabletten genommen",
+        "icon": "medical",
+        "color": "#4CAF50",
+        "xp_reward": 300,
+        "requirement_count": 30
+    },
+    {
+        "badge_type": "water_streak_14",
+        "title": "💧 Aqua-Champion",
+        "description": "14 Tage Wasserziel erreicht",
+        "icon": "water",
+        "color": "#2196F3",
+        "xp_reward": 200,
+        "requirement_count": 14
+    },
+    {
+        "badge_type": "perfect_week",
+        "title": "🔥 Perfekte Woche",
+        "description": "7 Tage alle Ziele erreicht",
+        "icon": "flame",
+        "color": "#FF5722",
+        "xp_reward": 250,
+        "requirement_count": 7
+    },
+    {
+        "badge_type": "tea_lover_20",
+        "title": "🫖 Tee-Liebhaber",
+        "description": "20x Ingwer-Knoblauch-Tee getrunken",
+        "icon": "leaf",
+        "color": "#4CAF50",
+        "xp_reward": 120,
+        "requirement_count": 20
+    },
+    {
+        "badge_type": "weight_loss_2kg",
+        "title": "📉 Erste Erfolge",
+        "description": "2kg erfolgreich abgenommen",
+        "icon": "trending-down",
+        "color": "#9C27B0",
+        "xp_reward": 400,
+        "requirement_count": 2
+    },
+    
+    # === ADVANCED ACHIEVEMENTS (Level 50-75) ===
+    {
+        "badge_type": "pills_streak_100",
+        "title": "💊 Pillen-Legende", 
+        "description": "100 Tage alle Tabletten genommen",
+        "icon": "medical",
+        "color": "#4CAF50",
+        "xp_reward": 1000,
+        "requirement_count": 100
+    },
+    {
+        "badge_type": "water_streak_30",
+        "title": "💧 Hydrations-König",
+        "description": "30 Tage Wasserziel erreicht",
+        "icon": "water",
+        "color": "#2196F3",
+        "xp_reward": 500,
+        "requirement_count": 30
+    },
+    {
+        "badge_type": "perfect_month",
+        "title": "🌙 Perfekter Monat",
+        "description": "30 Tage alle Ziele erreicht",
+        "icon": "moon",
+        "color": "#9C27B0",
+        "xp_reward": 750,
+        "requirement_count": 30
+    },
+    {
+        "badge_type": "water_cure_50",
+        "title": "💦 Wasserkur-Experte",
+        "description": "50x Wasserkur durchgeführt",
+        "icon": "medical",
+        "color": "#00BCD4",
+        "xp_reward": 300,
+        "requirement_count": 50
+    },
+    {
+        "badge_type": "weight_loss_5kg",
+        "title": "📉 Großer Erfolg",
+        "description": "5kg erfolgreich abgenommen",
+        "icon": "trending-down",
+        "color": "#9C27B0",
+        "xp_reward": 800,
+        "requirement_count": 5
+    },
+    {
+        "badge_type": "early_bird_30",
+        "title": "🌅 Frühaufsteher",
+        "description": "30x vor 8:00 Uhr Gewicht eingetragen",
+        "icon": "sunny",
+        "color": "#FFC107",
+        "xp_reward": 200,
+        "requirement_count": 30
+    },
+    
+    # === EXPERT ACHIEVEMENTS (Level 75-90) ===
+    {
+        "badge_type": "streak_master_50",
+        "title": "🔥 Streak-Master",
+        "description": "50 Tage perfektes Tracking",
+        "icon": "flame",
+        "color": "#FF5722",
+        "xp_reward": 1200,
+        "requirement_count": 50
+    },
+    {
+        "badge_type": "health_guru_90",
+        "title": "⭐ Gesundheits-Guru",
+        "description": "90 Tage alle Kategorien erfüllt",
+        "icon": "star",
+        "color": "#FFD700",
+        "xp_reward": 1500,
+        "requirement_count": 90
+    },
+    {
+        "badge_type": "pills_streak_365",
+        "title": "💊 Jahres-Champion",
+        "description": "365 Tage alle Tabletten genommen",
+        "icon": "medical",
+        "color": "#4CAF50",
+        "xp_reward": 2500,
+        "requirement_count": 365
+    },
+    {
+        "badge_type": "weight_loss_10kg",
+        "title": "📉 Transformation",
+        "description": "10kg erfolgreich abgenommen",
+        "icon": "trending-down",
+        "color": "#9C27B0",
+        "xp_reward": 2000,
+        "requirement_count": 10
+    },
+    
+    # === LEGENDARY ACHIEVEMENTS (Level 90-100) ===
+    {
+        "badge_type": "perfect_100_days",
+        "title": "💎 Diamant-Status",
+        "description": "100 Tage perfektes Tracking",
+        "icon": "diamond",
+        "color": "#E1BEE7",
+        "xp_reward": 3000,
+        "requirement_count": 100
+    },
+    {
+        "badge_type": "water_master_100",
+        "title": "💧 Aqua-Legende",
+        "description": "100 Tage Wasserziel erreicht",
+        "icon": "water",
+        "color": "#2196F3",
+        "xp_reward": 2000,
+        "requirement_count": 100
+    },
+    {
+        "badge_type": "consistency_king",
+        "title": "👑 Beständigkeits-König",
+        "description": "200 Tage App-Nutzung",
+        "icon": "crown",
+        "color": "#FFD700",
+        "xp_reward": 4000,
+        "requirement_count": 200
+    },
+    {
+        "badge_type": "weight_loss_20kg",
+        "title": "🏆 Mega-Transformation",
+        "description": "20kg erfolgreich abgenommen",
+        "icon": "trophy",
+        "color": "#FF6F00",
+        "xp_reward": 5000,
+        "requirement_count": 20
+    },
+    {
+        "badge_type": "zen_master",
+        "title": "🧘 Zen-Meister",
+        "description": "365 Tage perfekte Balance",
+        "icon": "flower",
+        "color": "#9C27B0",
+        "xp_reward": 10000,
+        "requirement_count": 365
+    },
+    
+    # === SPECIAL ACHIEVEMENTS ===
+    {
+        "badge_type": "night_owl",
+        "title": "🦉 Nachteule",
+        "description": "50x nach 22:00 Uhr getrackt",
+        "icon": "moon",
+        "color": "#3F51B5",
+        "xp_reward": 150,
+        "requirement_count": 50
+    },
+    {
+        "badge_type": "weekend_warrior",
+        "title": "🌅 Wochenend-Krieger",
+        "description": "20 perfekte Wochenenden",
+        "icon": "calendar",
+        "color": "#795548",
+        "xp_reward": 300,
+        "requirement_count": 20
+    },
+    {
+        "badge_type": "chat_enthusiast",
+        "title": "💬 Chat-Enthusiast",
+        "description": "100 Nachrichten mit Gugi",
+        "icon": "chatbubbles",
+        "color": "#FF69B4",
+        "xp_reward": 200,
+        "requirement_count": 100
+    },
+    {
+        "badge_type": "knowledge_seeker",
+        "title": "📚 Wissenssammler",
+        "description": "50 Tipps gespeichert",
+        "icon": "library",
+        "color": "#607D8B",
+        "xp_reward": 250,
+        "requirement_count": 50
+    }
+)
 
+# Seed documents for the default achievements, validated once at import.
+# Only `id` and `created_at` differ per insert and are filled in when seeding.
+DEFAULT_ACHIEVEMENT_DOCS = tuple(
+    Achievement(user_id="default", **ach).dict(exclude={"id", "created_at"})
+    for ach in DEFAULT_ACHIEVEMENTS
+)
+
+@lru_cache(maxsize=4096)
 def calculate_level_from_xp(xp: int) -> int:
     """Calculate user level based on XP (every 500 XP = 1 level)"""
     return max(1, (xp // 500) + 1)
 
+@lru_cache(maxsize=4096)
 def get_xp_for_next_level(current_xp: int) -> int:
     """Get XP needed for next level"""
     current_level = calculate_level_from_xp(current_xp)
     next_level_xp = current_level * 500
     return max(0, next_level_xp - current_xp)
 
+# Stat counter and XP awarded per tracked action
+ACTION_REWARDS = {
+    "pill_taken": ("pills_taken_total", 10),
+    "water_goal_reached": ("water_goals_achieved", 20),
+    "weight_entered": ("weight_entries_total", 15),
+    "perfect_day": ("perfect_days", 50),
+}
+
 async def update_user_stats_and_achievements(date_str: str, action_type: str, db_connection):
     """Update user stats and check for new achievements"""
     try:
-        # Get current user stats
-        user_stats = await db_connection.user_stats.find_one({"user_id": "default"})
-        if not user_stats:
-            # Initialize user stats
-            stats = UserStats()
-            await db_connection.user_stats.insert_one(stats.dict())
-            user_stats = stats.dict()
+        counter, xp_gained = ACTION_REWARDS.get(action_type, (None, 0))
+        increments = {"total_xp": xp_gained}
+        if counter:
+            increments[counter] = 1
         
-        stats_obj = UserStats(**user_stats)
-        xp_gained = 0
+        now = datetime.utcnow()
+        defaults = UserStats(created_at=now, updated_at=now).dict()
         
-        # Award XP based on action
-        if action_type == "pill_taken":
-            xp_gained = 10
-            stats_obj.pills_taken_total += 1
-        elif action_type == "water_goal_reached":
-            xp_gained = 20
-            stats_obj.water_goals_achieved += 1
-        elif action_type == "weight_entered":
-            xp_gained = 15
-            stats_obj.weight_entries_total += 1
-        elif action_type == "perfect_day":
-            xp_gained = 50
-            stats_obj.perfect_days += 1
-        
-        stats_obj.total_xp += xp_gained
-        stats_obj.current_level = calculate_level_from_xp(stats_obj.total_xp)
-        stats_obj.updated_at = datetime.utcnow()
-        
-        # Update stats in database
-        await db_connection.user_stats.update_one(
+        # Increment atomically, creating the stats document on first use
+        user_stats = await db_connection.user_stats.find_one_and_update(
             {"user_id": "default"},
-            {"$set": stats_obj.dict()},
-            upsert=True
+            {
+                "$inc": increments,
+                "$set": {"updated_at": now},
+                "$setOnInsert": {
+                    k: v for k, v in defaults.items()
+                    if k not in increments and k != "updated_at"
+                }
+            },
+            projection={"total_xp": 1, "current_level": 1, "_id": 0},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
         )
         
+        total_xp = user_stats["total_xp"]
+        level = calculate_level_from_xp(total_xp)
+        if level != user_stats.get("current_level"):
+            await db_connection.user_stats.update_one(
+                {"user_id": "default"},
+                {"$set": {"current_level": level}}
+            )
+        
         # Check for achievement unlocks
         await check_and_unlock_achievements(db_connection)
         
-        return {"xp_gained": xp_gained, "total_xp": stats_obj.total_xp, "level": stats_obj.current_level}
+        return {"xp_gained": xp_gained, "total_xp": total_xp, "level": level}
         
     except Exception as e:
         print(f"Error updating user stats: {e}")
@@ -698,18 +727,35 @@ async def update_user_stats_and_achievements(date_str: str, action_type: str, db
 async def check_and_unlock_achievements(db_connection):
     """Check if user has unlocked any new achievements"""
     try:
-        # Initialize achievements if not exist
-        existing_achievements = await db_connection.achievements.find({"user_id": "default"}).to_list(1000)
+        # Load achievements and all streaks concurrently; they are independent reads
+        (
+            existing_achievement,
+            achievements,
+            pill_streak,
+            water_streak,
+            weight_streak,
+        ) = await asyncio.gather(
+            db_connection.achievements.find_one({"user_id": "default"}, {"_id": 1}),
+            db_connection.achievements.find({"user_id": "default", "is_unlocked": False}).to_list(1000),
+            calculate_consecutive_pill_days(db_connection),
+            calculate_water_goal_streak(db_connection),
+            calculate_weight_entry_streak(db_connection),
+        )
         
-        if not existing_achievements:
-            default_achievements = initialize_default_achievements()
-            for ach in default_achievements:
-                achievement = Achievement(user_id="default", **ach)
-                await db_connection.achievements.insert_one(achievement.dict())
+        now = datetime.utcnow()
         
-        # Check achievement progress
-        achievements = await db_connection.achievements.find({"user_id": "default", "is_unlocked": False}).to_list(1000)
+        # Initialize achievements if not exist
+        if not existing_achievement:
+            default_achievements = [
+                {"id": uuid.uuid4().hex, **doc, "created_at": now}
+                for doc in DEFAULT_ACHIEVEMENT_DOCS
+            ]
+            await db_connection.achievements.insert_many(default_achievements, ordered=False)
+            achievements.extend(default_achievements)
         
+        # Check achievement progress
+        unlock_ops = []
+        xp_award = 0
         for ach_data in achievements:
             ach = Achievement(**ach_data)
             should_unlock = False
@@ -717,74 +763,100 @@ async def check_and_unlock_achievements(db_connection):
             # Check different achievement types
             if ach.badge_type == "pills_streak_7":
                 # Check if user has taken pills for 7 consecutive days
-                pill_streak = await calculate_consecutive_pill_days(db_connection)
                 if pill_streak >= 7:
                     should_unlock = True
                     
             elif ach.badge_type == "water_streak_5":
                 # Check water goal achievement streak
-                water_streak = await calculate_water_goal_streak(db_connection)
                 if water_streak >= 5:
                     should_unlock = True
                     
             elif ach.badge_type == "weight_consistency_10":
                 # Check consecutive weight entries
-                weight_streak = await calculate_weight_entry_streak(db_connection)
                 if weight_streak >= 10:
                     should_unlock = True
             
             if should_unlock:
-                await db_connection.achievements.update_one(
+                unlock_ops.append(UpdateOne(
                     {"id": ach.id},
                     {"$set": {
                         "is_unlocked": True,
-                        "unlocked_at": datetime.utcnow(),
+                        "unlocked_at": now,
                         "current_count": ach.requirement_count
                     }}
-                )
-                
-                # Award XP for achievement
-                user_stats = await db_connection.user_stats.find_one({"user_id": "default"})
-                if user_stats:
-                    new_xp = user_stats["total_xp"] + ach.xp_reward
-                    new_level = calculate_level_from_xp(new_xp)
+                ))
+                xp_award += ach.xp_reward
+        
+        if unlock_ops:
+            await db_connection.achievements.bulk_write(unlock_ops, ordered=False)
+            
+            # Award XP for all unlocked achievements at once
+            user_stats = await db_connection.user_stats.find_one_and_update(
+                {"user_id": "default"},
+                {"$inc": {"total_xp": xp_award}, "$set": {"updated_at": now}},
+                projection={"total_xp": 1, "current_level": 1, "_id": 0},
+                return_document=ReturnDocument.AFTER
+            )
+            if user_stats:
+                new_level = calculate_level_from_xp(user_stats["total_xp"])
+                if new_level != user_stats.get("current_level"):
                     await db_connection.user_stats.update_one(
                         {"user_id": "default"},
-                        {"$set": {
-                            "total_xp": new_xp,
-                            "current_level": new_level,
-                            "updated_at": datetime.utcnow()
-                        }}
+                        {"$set": {"current_level": new_level}}
                     )
                 
     except Exception as e:
         print(f"Error checking achievements: {e}")
 
+@lru_cache(maxsize=2)
+def streak_window(today_ordinal: int):
+    """Return the (start, end) datetimes of the 30-day streak window ending on the given day"""
+    today = date.fromordinal(today_ordinal)
+    return date_to_datetime(today - timedelta(days=30)), date_to_datetime(today)
+
+async def calculate_streak(collection, day_ok) -> int:
+    """Count consecutive days up to today whose entry satisfies the `day_ok` expression.
+
+    The whole scan runs as one aggregation: entries are projected down to their
+    date and `day_ok` result, collapsed to one per day, sorted newest first and
+    folded with $reduce, which only counts a day while it is exactly `count`
+    days before today and `day_ok` holds.
+    """
+    start, end = streak_window(date.today().toordinal())
+    
+    pipeline = [
+        {"$match": {"date": {"$gte": start, "$lte": end}}},
+        {"$project": {"_id": 0, "date": 1, "ok": day_ok}},
+        {"$sort": {"date": -1}},
+        {"$group": {"_id": "$date", "ok": {"$first": "$ok"}}},
+        {"$sort": {"_id": -1}},
+        {"$limit": 30},
+        {"$group": {"_id": None, "days": {"$push": {"date": "$_id", "ok": "$ok"}}}},
+        {"$project": {"_id": 0, "streak": {"$reduce": {
+            "input": "$days",
+            "initialValue": 0,
+            "in": {"$cond": [
+                {"$and": [
+                    "$$this.ok",
+                    {"$eq": ["$$this.date", {"$subtract": [end, {"$multiply": ["$$value", 86400000]}]}]}
+                ]},
+                {"$add": ["$$value", 1]},
+                "$$value"
+            ]}
+        }}}}
+    ]
+    
+    cursor = await collection.aggregate(pipeline)
+    result = await cursor.to_list(1)
+    return result[0]["streak"] if result else 0
+
 async def calculate_consecutive_pill_days(db_connection) -> int:
     """Calculate consecutive days of taking all pills"""
     try:
-        # Get last 30 days of pill data
-        end_date = date.today()
-        start_date = end_date - timedelta(days=30)
-        
-        pills_data = await db_connection.pill_tracking.find({
-            "date": {"$gte": date_to_datetime(start_date), "$lte": date_to_datetime(end_date)}
-        }).sort("date", -1).to_list(30)
-        
-        consecutive_days = 0
-        current_date = end_date
-        
-        for i in range(30):
-            check_date = current_date - timedelta(days=i)
-            pill_entry = next((p for p in pills_data if datetime_to_date(p["date"]) == check_date), None)
-            
-            if pill_entry and pill_entry.get("morning_taken", False) and pill_entry.get("evening_taken", False):
-                consecutive_days += 1
-            else:
-                break
-                
-        return consecutive_days
-        
+        return await calculate_streak(
+            db_connection.pill_tracking,
+            {"$and": ["$morning_taken", "$evening_taken"]}
+        )
     except Exception as e:
         print(f"Error calculating pill streak: {e}")
         return 0
@@ -792,27 +864,10 @@ async def calculate_consecutive_pill_days(db_connection) -> int:
 async def calculate_water_goal_streak(db_connection) -> int:
     """Calculate consecutive days of reaching water goals"""
     try:
-        end_date = date.today()
-        start_date = end_date - timedelta(days=30)
-        
-        water_data = await db_connection.water_intake.find({
-            "date": {"$gte": date_to_datetime(start_date), "$lte": date_to_datetime(end_date)}
-        }).sort("date", -1).to_list(30)
-        
-        consecutive_days = 0
-        current_date = end_date
-        
-        for i in range(30):
-            check_date = current_date - timedelta(days=i)
-            water_entry = next((w for w in water_data if datetime_to_date(w["date"]) == check_date), None)
-            
-            if water_entry and water_entry.get("total_ml", 0) >= water_entry.get("daily_goal_ml", 2000):
-                consecutive_days += 1
-            else:
-                break
-                
-        return consecutive_days
-        
+        return await calculate_streak(
+            db_connection.water_intake,
+            {"$gte": [{"$ifNull": ["$total_ml", 0]}, {"$ifNull": ["$daily_goal_ml", 2000]}]}
+        )
     except Exception as e:
         print(f"Error calculating water streak: {e}")
         return 0
@@ -820,46 +875,27 @@ async def calculate_water_goal_streak(db_connection) -> int:
 async def calculate_weight_entry_streak(db_connection) -> int:
     """Calculate consecutive days of weight entries"""
     try:
-        end_date = date.today()
-        start_date = end_date - timedelta(days=30)
-        
-        weight_data = await db_connection.weight_entries.find({
-            "date": {"$gte": date_to_datetime(start_date), "$lte": date_to_datetime(end_date)}
-        }).sort("date", -1).to_list(30)
-        
-        consecutive_days = 0
-        current_date = end_date
-        
-        for i in range(30):
-            check_date = current_date - timedelta(days=i)
-            weight_entry = next((w for w in weight_data if datetime_to_date(w["date"]) == check_date), None)
-            
-            if weight_entry:
-                consecutive_days += 1
-            else:
-                break
-                
-        return consecutive_days
-        
+        return await calculate_streak(db_connection.weight_entries, {"$literal": True})
     except Exception as e:
         print(f"Error calculating weight streak: {e}")
         return 0
 
+# Activity level adjustments for the daily water need
+ACTIVITY_MULTIPLIERS = {
+    'low': 1.0,
+    'medium': 1.2,
+    'high': 1.5
+}
+
 # Utility function to calculate daily water needs
+@lru_cache(maxsize=4096)
 def calculate_daily_water_need(weight_kg: float, height_cm: Optional[float] = None, 
                              age: Optional[int] = None, activity_level: str = 'medium') -> int:
     """Calculate daily water needs in ml based on weight, height, age, and activity level"""
     # Base calculation: 35ml per kg of body weight
     base_ml = weight_kg * 35
     
-    # Activity level adjustments
-    activity_multipliers = {
-        'low': 1.0,
-        'medium': 1.2,
-        'high': 1.5
-    }
-    
-    activity_ml = base_ml * activity_multipliers.get(activity_level, 1.2)
+    activity_ml = base_ml * ACTIVITY_MULTIPLIERS.get(activity_level, 1.2)
     
     # Age adjustments (older people need slightly less)
     if age and age > 65:
@@ -870,6 +906,160 @@ def calculate_daily_water_need(weight_kg: float, height_cm: Optional[float] = No
     # Minimum 1.5L, maximum 4L for safety
     return min(max(int(activity_ml), 1500), 4000)
 
+# Fixed system prompt for Gugi, shared by every chat session
+CHAT_SYSTEM_PROMPT = (
+    "Du bist Gugi, ein hilfreicher Gesundheitsassistent. "
+    "Antworte präzise, freundlich und verantwortungsbewusst auf Deutsch. "
+    "Biete strukturierte Tipps zu Rezepten, Gesundheit, Motivation und Zielen."
+)
+
+# Number of most recent messages returned for a stored chat session
+CHAT_HISTORY_LIMIT = 200
+
+# LlmChat instances reused across requests of the same session
+chat_sessions = LRUCache(maxsize=1024)
+chat_sessions_lock = asyncio.Lock()
+
+async def get_chat_session(session_id: str, api_key: str) -> LlmChat:
+    """Return the LlmChat for a session, creating it on first use"""
+    async with chat_sessions_lock:
+        chat = chat_sessions.get(session_id)
+        if chat is None:
+            chat = LlmChat(
+                api_key=api_key,
+                provider=os.environ.get('LLM_PROVIDER', 'google'),
+                model=os.environ.get('LLM_MODEL', 'gemini-2.5-pro'),
+                system_prompt=CHAT_SYSTEM_PROMPT,
+            )
+            chat_sessions[session_id] = chat
+        return chat
+
+# Answers to the first message of new chat sessions, keyed by the normalized message;
+# later turns depend on the conversation so far and always go to the LLM
+chat_response_cache = TTLCache(maxsize=1024, ttl=24 * 60 * 60)
+
+# First turns answered from chat_response_cache never reached the session's LlmChat;
+# they are sent along with the session's next message so the LLM keeps the context
+chat_cached_turns = LRUCache(maxsize=1024)
+
+def chat_cache_key(message: str) -> str:
+    """Hash a chat message; only differences in case and whitespace map to the same key"""
+    normalized = " ".join(message.lower().split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+# Saved-message counts per category, cleared whenever a saved message changes
+category_counts_cache = TTLCache(maxsize=1, ttl=30)
+
+# Singleton documents (user profile, active weight goal, settings) change on human timescales;
+# reads keep them for a minute and writes replace the cached entry directly. Each write bumps
+# the key's version, so a read that was in flight during the write doesn't cache its older copy
+singleton_cache = TTLCache(maxsize=8, ttl=60)
+singleton_versions: Dict[str, int] = {}
+
+def store_singleton(key: str, doc: dict):
+    """Cache a document that was just written"""
+    singleton_versions[key] = singleton_versions.get(key, 0) + 1
+    singleton_cache[key] = doc
+
+async def get_cached_singleton(key: str, collection, query: dict, seed=None):
+    """find_one through the singleton cache; returns a copy callers may modify.
+    If seed is given and nothing is stored, the document returned by seed() is inserted"""
+    try:
+        doc = singleton_cache[key]
+    except KeyError:
+        version = singleton_versions.get(key, 0)
+        doc = await collection.find_one(query, {"_id": 0})
+        if doc is None and seed is not None:
+            # Upserting keeps concurrent first requests from inserting twice
+            doc = await collection.find_one_and_update(
+                query,
+                {"$setOnInsert": seed()},
+                projection={"_id": 0},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        if singleton_versions.get(key, 0) == version:
+            singleton_cache[key] = doc
+        else:
+            # A write finished while we were reading and cached a newer document
+            doc = singleton_cache.get(key, doc)
+    return dict(doc) if doc else None
+
+def conditional_json_response(request: Request, doc: dict) -> Response:
+    """JSON response with an ETag; answers 304 when the client already has this version"""
+    body = orjson.dumps(doc)
+    etag = '"%s"' % hashlib.blake2b(body, digest_size=8).hexdigest()
+    # no-cache: clients may keep the body but must revalidate, so a PUT is never hidden
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+async def get_cached_profile():
+    """Return the user profile document, or None if none was saved yet"""
+    return await get_cached_singleton("user_profile", db.user_profile, {})
+
+async def get_cached_active_goal():
+    """Return the active weight goal document, or None"""
+    return await get_cached_singleton("active_goal", db.weight_goals, {"is_active": True})
+
+# Default settings documents, built once; only id and timestamps differ between users
+DEFAULT_NOTIFICATION_SETTINGS = NotificationSettings().model_dump(exclude={"id", "created_at", "updated_at"})
+DEFAULT_APP_SETTINGS = AppSettings().model_dump(exclude={"id", "created_at", "updated_at"})
+
+def new_settings_doc(defaults: dict) -> dict:
+    """Fresh settings document from the module-level defaults"""
+    now = datetime.utcnow()
+    return {**defaults, "id": uuid.uuid4().hex, "created_at": now, "updated_at": now}
+
+# Settings PUTs for the same document are coalesced: updates arriving while a write is
+# in flight are merged and written together once it finishes, so a burst of changes
+# (e.g. a slider) costs two round trips instead of one per request
+settings_write_locks: Dict[str, asyncio.Lock] = {}
+settings_pending: Dict[str, tuple] = {}
+settings_flushes: set = set()
+
+async def write_settings(collection, update_data: dict, new_settings: dict) -> dict:
+    """Upsert the default user's settings document, merging concurrent updates into one write"""
+    key = collection.name
+    batch = settings_pending.get(key)
+    if batch is None:
+        batch = settings_pending[key] = ({}, asyncio.get_running_loop().create_future())
+        # The batch is written by its own task, so a client disconnecting from the request
+        # that opened it doesn't cancel the write for everyone who joined
+        flush = asyncio.create_task(flush_settings(collection, batch, new_settings))
+        settings_flushes.add(flush)
+        flush.add_done_callback(settings_flushes.discard)
+    merged, done = batch
+    merged.update(update_data)
+    return await asyncio.shield(done)
+
+async def flush_settings(collection, batch: tuple, new_settings: dict):
+    """Write one batch of settings updates once the previous write has finished"""
+    key = collection.name
+    merged, done = batch
+    lock = settings_write_locks.get(key)
+    if lock is None:
+        lock = settings_write_locks[key] = asyncio.Lock()
+    async with lock:
+        # Updates that joined until now go into this write; later ones start a new batch
+        del settings_pending[key]
+        try:
+            updated = await collection.find_one_and_update(
+                {"user_id": "default"},
+                {"$set": merged, "$setOnInsert": set_on_insert(new_settings, merged)},
+                projection={"_id": 0},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except Exception as e:
+            done.set_exception(e)
+        except BaseException:
+            done.cancel()
+            raise
+        else:
+            done.set_result(updated)
+
 # Routes
 @api_router.get("/")
 async def root():
@@ -878,215 +1068,217 @@ async def root():
 # Health AI Chat Routes
 @api_router.post("/health-chat")
 async def health_chat(request: ChatRequest):
-    try:
-        # Online KI (Google Gemini via Emergent Universal Key)
-        api_key = os.environ.get('EMERGENT_LLM_KEY')
-        if not api_key:
-            raise HTTPException(status_code=500, detail="EMERGENT_LLM_KEY fehlt im Backend")
-        system_prompt = (
-            "Du bist Gugi, ein hilfreicher Gesundheitsassistent. "
-            "Antworte präzise, freundlich und verantwortungsbewusst auf Deutsch. "
-            "Biete strukturierte Tipps zu Rezepten, Gesundheit, Motivation und Zielen."
-        )
-        chat = LlmChat(
-            api_key=api_key,
-            provider=os.environ.get('LLM_PROVIDER', 'google'),
-            model=os.environ.get('LLM_MODEL', 'gemini-2.5-pro'),
-            system_prompt=system_prompt,
-        )
-        user_message = UserMessage(content=request.message)
+    # Online KI (Google Gemini via Emergent Universal Key)
+    api_key = os.environ.get('EMERGENT_LLM_KEY')
+    if not api_key:
+        raise HTTPException(status_code=500, detail="EMERGENT_LLM_KEY fehlt im Backend")
+    # Kein DB‑Speichern (App ist offline‑first). Session-ID wählt die Chat-Instanz im Speicher.
+    session_id = request.session_id or str(uuid.uuid4())
+    # Nur die erste Nachricht einer neuen Sitzung hat keinen Kontext; nur diese aus dem Cache beantworten
+    cache_key = chat_cache_key(request.message) if request.session_id is None else None
+    ai_response = chat_response_cache.get(cache_key) if cache_key else None
+    if ai_response is None:
+        chat = await get_chat_session(session_id, api_key)
+        content = request.message
+        cached_turn = chat_cached_turns.pop(session_id, None)
+        if cached_turn:
+            # Die aus dem Cache beantwortete erste Frage kennt das LLM noch nicht; als Verlauf mitschicken
+            question, answer = cached_turn
+            content = f"Bisheriger Verlauf:\nNutzer: {question}\nAssistent: {answer}\n\nNutzer: {request.message}"
+        user_message = UserMessage(content=content)
         ai_response = await chat.send_message(user_message)
-        # Kein DB‑Speichern (App ist offline‑first). Session-ID nur für UI‑Konsistenz.
-        session_id = request.session_id or str(uuid.uuid4())
-        return {"session_id": session_id, "response": ai_response}
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Chat-Fehler: {e}")
+        if cache_key:
+            chat_response_cache[cache_key] = ai_response
+    else:
+        chat_cached_turns[session_id] = (request.message, ai_response)
+    return {"session_id": session_id, "response": ai_response}
 
 @api_router.get("/health-chat/{session_id}")
 async def get_chat_history(session_id: str):
-    try:
-        session = await db.chat_sessions.find_one({"session_id": session_id})
-        if session:
-            return HealthChatSession(**session)
-        return {"messages": []}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    # Only the most recent turns are ever shown; don't ship the rest of long sessions
+    session = await db.chat_sessions.find_one(
+        {"session_id": session_id},
+        {"_id": 0, "messages": {"$slice": -CHAT_HISTORY_LIMIT}}
+    )
+    if session:
+        return HealthChatSession(**session)
+    return {"messages": []}
 
 # Saved Chat Messages Routes
 @api_router.post("/saved-messages", response_model=SavedChatMessage)
 async def save_chat_message(request: SaveChatMessageRequest):
     """Save a chat message with category and title for later reference"""
-    try:
-        saved_message = SavedChatMessage(**request.dict())
-        await db.saved_chat_messages.insert_one(saved_message.dict())
-        return saved_message
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error saving message: {str(e)}")
+    saved_message = SavedChatMessage(**request.dict())
+    await db.saved_chat_messages.insert_one(saved_message.dict())
+    category_counts_cache.clear()
+    return saved_message
 
-@api_router.get("/saved-messages", response_model=List[SavedChatMessage])
+@api_router.get("/saved-messages", responses={200: {"model": List[SavedChatMessage]}})
 async def get_saved_messages(category: Optional[ChatCategory] = None, tag: Optional[str] = None):
     """Get saved chat messages, optionally filtered by category or tag"""
-    try:
-        query = {}
-        if category:
-            query["category"] = category.value
-        if tag:
-            query["tags"] = {"$in": [tag]}
-            
-        messages = await db.saved_chat_messages.find(query).sort("created_at", -1).to_list(1000)
-        return [SavedChatMessage(**msg) for msg in messages]
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    query = {}
+    if category:
+        query["category"] = category.value
+    if tag:
+        query["tags"] = {"$in": [tag]}
+        
+    messages = await db.saved_chat_messages.find(query, {"_id": 0}).sort("created_at", -1).to_list(1000)
+    return ORJSONResponse(messages)
 
-@api_router.get("/saved-messages/{message_id}", response_model=SavedChatMessage)
+@api_router.get("/saved-messages/{message_id}", responses={200: {"model": SavedChatMessage}})
 async def get_saved_message(message_id: str):
     """Get a specific saved message by ID"""
-    try:
-        message = await db.saved_chat_messages.find_one({"id": message_id})
-        if not message:
-            raise HTTPException(status_code=404, detail="Message not found")
-        return SavedChatMessage(**message)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    message = await db.saved_chat_messages.find_one({"id": message_id}, {"_id": 0})
+    if not message:
+        raise HTTPException(status_code=404, detail="Message not found")
+    return ORJSONResponse(message)
 
 @api_router.put("/saved-messages/{message_id}", response_model=SavedChatMessage)
 async def update_saved_message(message_id: str, request: UpdateSavedMessageRequest):
     """Update a saved message's title, category, or tags"""
-    try:
-        update_data = {}
-        if request.title is not None:
-            update_data["title"] = request.title
-        if request.category is not None:
-            update_data["category"] = request.category.value
-        if request.tags is not None:
-            update_data["tags"] = request.tags
-            
-        update_data["updated_at"] = datetime.utcnow()
-        
-        await db.saved_chat_messages.update_one(
-            {"id": message_id},
-            {"$set": update_data}
-        )
+    update_data = {}
+    if request.title is not None:
+        update_data["title"] = request.title
+    if request.category is not None:
+        update_data["category"] = request.category.value
+    if request.tags is not None:
+        update_data["tags"] = request.tags
+        
+    update_data["updated_at"] = datetime.utcnow()
+    
+    updated_message = await db.saved_chat_messages.find_one_and_update(
+        {"id": message_id},
+        {"$set": update_data},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if not updated_message:
+        raise HTTPException(status_code=404, detail="Message not found")
+    category_counts_cache.clear()
         
-        updated_message = await db.saved_chat_messages.find_one({"id": message_id})
-        if not updated_message:
-            raise HTTPException(status_code=404, detail="Message not found")
-            
-        return SavedChatMessage(**updated_message)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return SavedChatMessage(**updated_message)
 
 @api_router.delete("/saved-messages/{message_id}")
 async def delete_saved_message(message_id: str):
     """Delete a saved message"""
-    try:
-        result = await db.saved_chat_messages.delete_one({"id": message_id})
-        if result.deleted_count == 0:
-            raise HTTPException(status_code=404, detail="Message not found")
-        return {"message": "Saved message deleted"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    result = await db.saved_chat_messages.delete_one({"id": message_id})
+    if result.deleted_count == 0:
+        raise HTTPException(status_code=404, detail="Message not found")
+    category_counts_cache.clear()
+    return {"message": "Saved message deleted"}
 
 @api_router.get("/saved-messages/categories/all")
 async def get_categories_with_counts():
     """Get all categories with their message counts"""
-    try:
-        pipeline = [
-            {"$group": {"_id": "$category", "count": {"$sum": 1}}},
-            {"$sort": {"_id": 1}}
-        ]
-        
-        result = await db.saved_chat_messages.aggregate(pipeline).to_list(1000)
-        
-        categories = {}
-        for item in result:
-            categories[item["_id"]] = item["count"]
-            
+    categories = category_counts_cache.get("all")
+    if categories is not None:
         return categories
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    
+    # Sorting on category first lets the group walk the category index
+    pipeline = [
+        {"$sort": {"category": 1}},
+        {"$group": {"_id": "$category", "count": {"$sum": 1}}},
+        {"$sort": {"_id": 1}}
+    ]
+    
+    cursor = await db.saved_chat_messages.aggregate(pipeline, allowDiskUse=False)
+    result = await cursor.to_list(100)
+    
+    categories = {}
+    for item in result:
+        categories[item["_id"]] = item["count"]
+    
+    category_counts_cache["all"] = categories
+    return categories
 
 # Weight Progress with Differences Route
 @api_router.get("/weight-progress/{days}")
 async def get_weight_progress(days: int):
     """Get weight progress for the last X days with differences"""
-    try:
-        if days < 1 or days > 365:
-            raise HTTPException(status_code=400, detail="Days must be between 1 and 365")
-            
-        end_date = date.today()
-        start_date = end_date - timedelta(days=days-1)
-        
-        # Get weight entries for the date range
-        weight_entries = await db.weight_entries.find({
-            "date": {"$gte": date_to_datetime(start_date), "$lte": date_to_datetime(end_date)}
-        }).sort("date", 1).to_list(days)
-        
-        if not weight_entries:
-            return {"progress": [], "summary": {"total_days": days, "entries_found": 0}}
-        
-        # Convert to WeightEntry objects and calculate differences
-        progress = []
-        previous_weight = None
-        
-        for entry in weight_entries:
-            weight_entry = WeightEntry.from_mongo(entry)
-            
-            # Calculate difference from previous day
-            difference = None
-            if previous_weight is not None:
-                difference = round(weight_entry.weight - previous_weight, 1)
-            
-            progress_entry = WeightProgress(
-                date=weight_entry.date,
-                weight=weight_entry.weight,
-                difference=difference
-            )
-            progress.append(progress_entry)
-            previous_weight = weight_entry.weight
+    if days < 1 or days > 365:
+        raise HTTPException(status_code=400, detail="Days must be between 1 and 365")
         
-        # Calculate summary statistics
-        if len(progress) > 1:
-            total_change = round(progress[-1].weight - progress[0].weight, 1)
-            average_daily_change = round(total_change / (len(progress) - 1), 2)
+    end_date = date.today()
+    start_date = end_date - timedelta(days=days-1)
+    
+    # Compute each entry's difference from the previous one in the database
+    pipeline = [
+        {"$match": {"date": {"$gte": date_to_datetime(start_date), "$lte": date_to_datetime(end_date)}}},
+        {"$sort": {"date": 1}},
+        {"$limit": days},
+        {"$setWindowFields": {
+            "sortBy": {"date": 1},
+            "output": {"prev": {"$shift": {"output": "$weight", "by": -1}}}
+        }},
+        {"$project": {
+            "_id": 0,
+            "date": 1,
+            "weight": 1,
+            "difference": {"$round": [{"$subtract": ["$weight", "$prev"]}, 1]}
+        }}
+    ]
+    # At most one entry per day: fetch them all in the first batch so a query failure is
+    # raised here, before the 200 status is sent, rather than truncating the streamed body
+    cursor = await db.weight_entries.aggregate(pipeline, batchSize=days)
+    
+    async def stream_progress():
+        # Emit entries as the cursor yields them; the summary only needs
+        # the count and the first and last weights
+        entries_found = 0
+        start_weight = current_weight = None
+        yield b'{"progress":['
+        # Close the server-side cursor even if the client disconnects mid-stream
+        try:
+            async for entry in cursor:
+                current_weight = entry["weight"]
+                if entries_found:
+                    yield b","
+                else:
+                    start_weight = current_weight
+                entries_found += 1
+                yield orjson.dumps({
+                    "date": datetime_to_date(entry["date"]),
+                    "weight": current_weight,
+                    "difference": entry.get("difference")
+                })
+        finally:
+            await cursor.close()
+        
+        if not entries_found:
+            summary = {"total_days": days, "entries_found": 0}
         else:
-            total_change = 0.0
-            average_daily_change = 0.0
+            # Calculate summary statistics
+            if entries_found > 1:
+                total_change = round(current_weight - start_weight, 1)
+                average_daily_change = round(total_change / (entries_found - 1), 2)
+            else:
+                total_change = 0.0
+                average_daily_change = 0.0
             
-        summary = {
-            "total_days": days,
-            "entries_found": len(progress),
-            "total_change": total_change,
-            "start_weight": progress[0].weight if progress else None,
-            "current_weight": progress[-1].weight if progress else None,
-            "average_daily_change": average_daily_change
-        }
-        
-        return {
-            "progress": [p.dict() for p in progress],
-            "summary": summary
-        }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+            summary = {
+                "total_days": days,
+                "entries_found": entries_found,
+                "total_change": total_change,
+                "start_weight": start_weight,
+                "current_weight": current_weight,
+                "average_daily_change": average_daily_change
+            }
+        yield b'],"summary":' + orjson.dumps(summary) + b"}"
+    
+    # The background close covers a response whose body is never iterated
+    return StreamingResponse(stream_progress(), media_type="application/json", background=BackgroundTask(cursor.close))
 
 # Pill Tracking Routes
-@api_router.get("/pills/{date_str}", response_model=Optional[PillTracking])
-async def get_pill_tracking(date_str: str):
-    try:
-        tracking_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-        pill_data = await db.pill_tracking.find_one({"date": date_to_datetime(tracking_date)})
-        if pill_data:
-            return PillTracking.from_mongo(pill_data)
-        return None
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+@api_router.get("/pills/{tracking_date}", responses={200: {"model": Optional[PillTracking]}})
+async def get_pill_tracking(tracking_date: date):
+    pill_data = await db.pill_tracking.find_one({"date": date_to_datetime(tracking_date)}, {"_id": 0})
+    if pill_data:
+        return ORJSONResponse(PillTracking.json_doc(pill_data))
+    return None
 
 @api_router.post("/pills", response_model=PillTracking)
 async def create_pill_tracking(input: PillTrackingCreate):
-    existing = await db.pill_tracking.find_one({"date": date_to_datetime(input.date)})
+    existing = await db.pill_tracking.find_one({"date": date_to_datetime(input.date)}, {"_id": 1})
     if existing:
         raise HTTPException(status_code=400, detail="Tracking for this date already exists")
     
@@ -1094,153 +1286,124 @@ async def create_pill_tracking(input: PillTrackingCreate):
     await db.pill_tracking.insert_one(pill_obj.to_mongo())
     return pill_obj
 
-@api_router.put("/pills/{date_str}", response_model=PillTracking)
-async def update_pill_tracking(date_str: str, input: PillUpdate):
-    try:
-        tracking_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-        existing = await db.pill_tracking.find_one({"date": date_to_datetime(tracking_date)})
-        
-        if not existing:
-            # Create new if doesn't exist
-            pill_data = {"date": tracking_date, "morning_taken": False, "evening_taken": False}
-            pill_obj = PillTracking(**pill_data)
-        else:
-            pill_obj = PillTracking.from_mongo(existing)
-        
-        # Update fields
-        update_data = {}
-        if input.morning_taken is not None:
-            update_data["morning_taken"] = input.morning_taken
-        if input.evening_taken is not None:
-            update_data["evening_taken"] = input.evening_taken
-        
-        update_data["updated_at"] = datetime.utcnow()
-        
-        if existing:
-            await db.pill_tracking.update_one(
-                {"date": date_to_datetime(tracking_date)},
-                {"$set": update_data}
-            )
-        else:
-            pill_obj = PillTracking(**{**pill_obj.dict(), **update_data})
-            await db.pill_tracking.insert_one(pill_obj.to_mongo())
-        
-        # Return updated object
-        updated = await db.pill_tracking.find_one({"date": date_to_datetime(tracking_date)})
-        return PillTracking.from_mongo(updated)
-        
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+@api_router.put("/pills/{tracking_date}", response_model=PillTracking)
+async def update_pill_tracking(tracking_date: date, input: PillUpdate):
+    tracking_dt = date_to_datetime(tracking_date)
+    
+    # Update fields
+    update_data = {}
+    if input.morning_taken is not None:
+        update_data["morning_taken"] = input.morning_taken
+    if input.evening_taken is not None:
+        update_data["evening_taken"] = input.evening_taken
+    
+    now = datetime.utcnow()
+    update_data["updated_at"] = now
+    
+    # Update in place, or create the day with both pills untaken if it doesn't exist
+    new_pill = PillTracking(date=tracking_date, created_at=now, updated_at=now).to_mongo()
+    updated = await db.pill_tracking.find_one_and_update(
+        {"date": tracking_dt},
+        {"$set": update_data, "$setOnInsert": set_on_insert(new_pill, update_data)},
+        projection={"_id": 0},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return PillTracking.from_mongo(updated)
 
 # Drink Tracking Routes
-@api_router.get("/drinks/{date_str}", response_model=Optional[DrinkTracking])
-async def get_drink_tracking(date_str: str):
-    try:
-        tracking_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-        drink_data = await db.drink_tracking.find_one({"date": date_to_datetime(tracking_date)})
-        if drink_data:
-            return DrinkTracking.from_mongo(drink_data)
-        return None
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+@api_router.get("/drinks/{tracking_date}", responses={200: {"model": Optional[DrinkTracking]}})
+async def get_drink_tracking(tracking_date: date):
+    drink_data = await db.drink_tracking.find_one({"date": date_to_datetime(tracking_date)}, {"_id": 0})
+    if drink_data:
+        return ORJSONResponse(DrinkTracking.json_doc(drink_data))
+    return None
 
-@api_router.put("/drinks/{date_str}", response_model=DrinkTracking)
-async def update_drink_tracking(date_str: str, input: DrinkUpdate):
-    try:
-        tracking_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-        existing = await db.drink_tracking.find_one({"date": date_to_datetime(tracking_date)})
-        
-        if not existing:
-            # Create new
-            drinks_dict = {drink_type: 0 for drink_type in DrinkType}
-            drinks_dict[input.drink_type] = input.count
-            drink_obj = DrinkTracking(date=tracking_date, drinks=drinks_dict)
-            await db.drink_tracking.insert_one(drink_obj.to_mongo())
-            return drink_obj
-        else:
-            # Update existing
-            existing_drinks = existing.get("drinks", {})
-            existing_drinks[input.drink_type.value] = input.count
-            
-            await db.drink_tracking.update_one(
-                {"date": date_to_datetime(tracking_date)},
-                {"$set": {"drinks": existing_drinks, "updated_at": datetime.utcnow()}}
-            )
-            
-            updated = await db.drink_tracking.find_one({"date": date_to_datetime(tracking_date)})
-            return DrinkTracking.from_mongo(updated)
-            
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+@api_router.put("/drinks/{tracking_date}", response_model=DrinkTracking)
+async def update_drink_tracking(tracking_date: date, input: DrinkUpdate):
+    tracking_dt = date_to_datetime(tracking_date)
+    
+    # Set the one drink count; a new day starts every other drink at 0
+    now = datetime.utcnow()
+    update_data = {f"drinks.{input.drink_type.value}": input.count, "updated_at": now}
+    new_drinks = DrinkTracking(date=tracking_date, created_at=now, updated_at=now).to_mongo()
+    del new_drinks["drinks"]
+    for drink_type in DrinkType:
+        if drink_type is not input.drink_type:
+            new_drinks[f"drinks.{drink_type.value}"] = 0
+    
+    updated = await db.drink_tracking.find_one_and_update(
+        {"date": tracking_dt},
+        {"$set": update_data, "$setOnInsert": set_on_insert(new_drinks, update_data)},
+        projection={"_id": 0},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return DrinkTracking.from_mongo(updated)
 
 # Weight Tracking Routes
-@api_router.get("/weight/{date_str}", response_model=Optional[WeightEntry])
-async def get_weight_entry(date_str: str):
-    try:
-        tracking_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-        weight_data = await db.weight_entries.find_one({"date": date_to_datetime(tracking_date)})
-        if weight_data:
-            return WeightEntry.from_mongo(weight_data)
-        return None
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+@api_router.get("/weight/{tracking_date}", responses={200: {"model": Optional[WeightEntry]}})
+async def get_weight_entry(tracking_date: date):
+    weight_data = await db.weight_entries.find_one({"date": date_to_datetime(tracking_date)}, {"_id": 0})
+    if weight_data:
+        return ORJSONResponse(WeightEntry.json_doc(weight_data))
+    return None
 
 @api_router.post("/weight", response_model=WeightEntry)
 async def create_weight_entry(input: WeightEntryCreate):
-    existing = await db.weight_entries.find_one({"date": date_to_datetime(input.date)})
-    if existing:
-        # Update existing
-        await db.weight_entries.update_one(
-            {"date": date_to_datetime(input.date)},
-            {"$set": {"weight": input.weight, "updated_at": datetime.utcnow()}}
-        )
-        updated = await db.weight_entries.find_one({"date": date_to_datetime(input.date)})
-        return WeightEntry.from_mongo(updated)
-    else:
-        weight_obj = WeightEntry(**input.dict())
-        await db.weight_entries.insert_one(weight_obj.to_mongo())
-        return weight_obj
-
-@api_router.get("/weight/range/{start_date}/{end_date}", response_model=List[WeightEntry])
-async def get_weight_range(start_date: str, end_date: str):
-    try:
-        start = datetime.strptime(start_date, "%Y-%m-%d").date()
-        end = datetime.strptime(end_date, "%Y-%m-%d").date()
-        
-        weight_entries = await db.weight_entries.find({
-            "date": {"$gte": date_to_datetime(start), "$lte": date_to_datetime(end)}
-        }).sort("date", 1).to_list(1000)
-        
-        return [WeightEntry.from_mongo(entry) for entry in weight_entries]
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    entry_dt = date_to_datetime(input.date)
+    # One entry per day: update the existing weight or create the entry
+    now = datetime.utcnow()
+    update_data = {"weight": input.weight, "updated_at": now}
+    new_entry = WeightEntry(**input.dict(), created_at=now, updated_at=now).to_mongo()
+    updated = await db.weight_entries.find_one_and_update(
+        {"date": entry_dt},
+        {"$set": update_data, "$setOnInsert": set_on_insert(new_entry, update_data)},
+        projection={"_id": 0},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return WeightEntry.from_mongo(updated)
+
+@api_router.get("/weight/range/{start_date}/{end_date}", responses={200: {"model": List[WeightEntry]}})
+async def get_weight_range(start_date: date, end_date: date):
+    weight_entries = await db.weight_entries.find(
+        {"date": {"$gte": date_to_datetime(start_date), "$lte": date_to_datetime(end_date)}},
+        {"_id": 0}
+    ).sort("date", 1).to_list(1000)
+    
+    return ORJSONResponse(WeightEntry.json_docs(weight_entries))
 
 # Weight Goals Routes
-@api_router.get("/weight-goals", response_model=List[WeightGoal])
+@api_router.get("/weight-goals", responses={200: {"model": List[WeightGoal]}})
 async def get_weight_goals():
-    goals = await db.weight_goals.find().sort("created_at", -1).to_list(1000)
-    return [WeightGoal.from_mongo(goal) for goal in goals]
+    goals = await db.weight_goals.find({}, {"_id": 0}).sort("created_at", -1).to_list(1000)
+    return ORJSONResponse(WeightGoal.json_docs(goals))
 
 @api_router.post("/weight-goals", response_model=WeightGoal)
 async def create_weight_goal(input: WeightGoalCreate):
-    # Deactivate previous goals
-    await db.weight_goals.update_many({}, {"$set": {"is_active": False}})
-    
-    goal_obj = WeightGoal(**input.dict())
-    await db.weight_goals.insert_one(goal_obj.to_mongo())
+    now = datetime.utcnow()
+    goal_obj = WeightGoal(**input.dict(), created_at=now, updated_at=now)
+    # Deactivate the previous goal and insert the new one in a single ordered batch;
+    # matching only active goals lets the is_active index skip the inactive history
+    await db.weight_goals.bulk_write([
+        UpdateMany({"is_active": True}, {"$set": {"is_active": False}}),
+        InsertOne(goal_obj.to_mongo()),
+    ], ordered=True)
+    store_singleton("active_goal", goal_obj.to_mongo())
     return goal_obj
 
-@api_router.get("/weight-goals/active", response_model=Optional[WeightGoal])
+@api_router.get("/weight-goals/active", responses={200: {"model": Optional[WeightGoal]}})
 async def get_active_weight_goal():
-    goal = await db.weight_goals.find_one({"is_active": True})
+    goal = await get_cached_active_goal()
     if goal:
-        return WeightGoal.from_mongo(goal)
+        return ORJSONResponse(WeightGoal.json_doc(goal))
     return None
 
 @api_router.get("/weight-goals/daily-target/{current_weight}")
 async def get_daily_target(current_weight: float):
     """Calculate daily weight target based on active goal"""
-    active_goal = await db.weight_goals.find_one({"is_active": True})
+    active_goal = await get_cached_active_goal()
     if not active_goal:
         return {"error": "No active goal found"}
     
@@ -1272,10 +1435,10 @@ async def get_daily_target(current_weight: float):
     }
 
 # Reminders Routes
-@api_router.get("/reminders", response_model=List[Reminder])
+@api_router.get("/reminders", responses={200: {"model": List[Reminder]}})
 async def get_reminders():
-    reminders = await db.reminders.find().to_list(1000)
-    return [Reminder(**reminder) for reminder in reminders]
+    reminders = await db.reminders.find({}, {"_id": 0}).to_list(1000)
+    return ORJSONResponse(reminders)
 
 @api_router.post("/reminders", response_model=Reminder)
 async def create_reminder(input: ReminderCreate):
@@ -1285,12 +1448,12 @@ async def create_reminder(input: ReminderCreate):
 
 @api_router.put("/reminders/{reminder_id}", response_model=Reminder)
 async def update_reminder(reminder_id: str, input: ReminderCreate):
-    await db.reminders.update_one(
+    updated = await db.reminders.find_one_and_update(
         {"id": reminder_id},
-        {"$set": {**input.dict(), "updated_at": datetime.utcnow()}}
+        {"$set": {**input.dict(), "updated_at": datetime.utcnow()}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
     )
-    
-    updated = await db.reminders.find_one({"id": reminder_id})
     if not updated:
         raise HTTPException(status_code=404, detail="Reminder not found")
     
@@ -1304,98 +1467,136 @@ async def delete_reminder(reminder_id: str):
     return {"message": "Reminder deleted"}
 
 # Dashboard Summary Route
-@api_router.get("/dashboard/{date_str}")
-async def get_dashboard_summary(date_str: str):
-    try:
-        tracking_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-        
-        # Get all data for the date
-        pills = await db.pill_tracking.find_one({"date": date_to_datetime(tracking_date)})
-        drinks = await db.drink_tracking.find_one({"date": date_to_datetime(tracking_date)})
-        weight = await db.weight_entries.find_one({"date": date_to_datetime(tracking_date)})
-        active_goal = await db.weight_goals.find_one({"is_active": True})
-        water_intake = await db.water_intake.find_one({"date": date_to_datetime(tracking_date)})
-        user_profile = await db.user_profile.find_one({})
-        
-        return {
-            "date": tracking_date,
-            "pills": PillTracking.from_mongo(pills) if pills else None,
-            "drinks": DrinkTracking.from_mongo(drinks) if drinks else None,
-            "weight": WeightEntry.from_mongo(weight) if weight else None,
-            "active_goal": WeightGoal.from_mongo(active_goal) if active_goal else None,
-            "water_intake": WaterIntake.from_mongo(water_intake) if water_intake else None,
-            "user_profile": UserProfile(**user_profile) if user_profile else None
-        }
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+@api_router.get("/dashboard/{tracking_date}")
+async def get_dashboard_summary(tracking_date: date):
+    tracking_dt = date_to_datetime(tracking_date)
+    
+    # Get all data for the date; the lookups are independent, so run them concurrently
+    pills, drinks, weight, active_goal, water_intake, user_profile = await asyncio.gather(
+        db.pill_tracking.find_one({"date": tracking_dt}, {"_id": 0}),
+        db.drink_tracking.find_one({"date": tracking_dt}, {"_id": 0}),
+        db.weight_entries.find_one({"date": tracking_dt}, {"_id": 0}),
+        get_cached_active_goal(),
+        db.water_intake.find_one({"date": tracking_dt}, {"_id": 0}),
+        get_cached_profile(),
+    )
+    
+    return {
+        "date": tracking_date,
+        "pills": PillTracking.from_mongo(pills) if pills else None,
+        "drinks": DrinkTracking.from_mongo(drinks) if drinks else None,
+        "weight": WeightEntry.from_mongo(weight) if weight else None,
+        "active_goal": WeightGoal.from_mongo(active_goal) if active_goal else None,
+        "water_intake": WaterIntake.from_mongo(water_intake) if water_intake else None,
+        "user_profile": UserProfile(**user_profile) if user_profile else None
+    }
 
 # User Profile Routes
 @api_router.get("/user-profile", response_model=Optional[UserProfile])
 async def get_user_profile():
-    try:
-        profile = await db.user_profile.find_one({})
-        if profile:
-            return UserProfile(**profile)
-        return None
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    profile = await get_cached_profile()
+    if profile:
+        return UserProfile(**profile)
+    return None
 
 @api_router.post("/user-profile", response_model=UserProfile)
 async def create_or_update_user_profile(profile_data: UserProfileCreate):
-    try:
-        existing = await db.user_profile.find_one({})
-        
-        if existing:
-            # Update existing profile
-            update_data = {k: v for k, v in profile_data.dict().items() if v is not None}
-            update_data["updated_at"] = datetime.utcnow()
-            
-            await db.user_profile.update_one(
-                {"id": existing["id"]},
-                {"$set": update_data}
-            )
-            
-            updated = await db.user_profile.find_one({"id": existing["id"]})
-            return UserProfile(**updated)
-        else:
-            # Create new profile
-            profile = UserProfile(**profile_data.dict())
-            await db.user_profile.insert_one(profile.dict())
-            return profile
-            
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    # Update the single profile, or create it on first save
+    update_data = {k: v for k, v in profile_data.dict().items() if v is not None}
+    now = datetime.utcnow()
+    update_data["updated_at"] = now
+    new_profile = UserProfile(**profile_data.dict(), created_at=now, updated_at=now).dict()
+    
+    updated = await db.user_profile.find_one_and_update(
+        {},
+        {"$set": update_data, "$setOnInsert": set_on_insert(new_profile, update_data)},
+        projection={"_id": 0},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    store_singleton("user_profile", updated)
+    return UserProfile(**updated)
 
 # Water Intake Routes
-@api_router.get("/water-intake/{date_str}", response_model=Optional[WaterIntake])
-async def get_water_intake(date_str: str):
-    try:
-        tracking_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-        water_data = await db.water_intake.find_one({"date": date_to_datetime(tracking_date)})
-        if water_data:
-            return WaterIntake.from_mongo(water_data)
-        return None
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+@api_router.get("/water-intake/{tracking_date}", responses={200: {"model": Optional[WaterIntake]}})
+async def get_water_intake(tracking_date: date):
+    water_data = await db.water_intake.find_one({"date": date_to_datetime(tracking_date)}, {"_id": 0})
+    if water_data:
+        return ORJSONResponse(WaterIntake.json_doc(water_data))
+    return None
 
-@api_router.put("/water-intake/{date_str}", response_model=WaterIntake)
-async def update_water_intake(date_str: str, update_data: WaterIntakeUpdate):
-    try:
-        tracking_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-        
-        # Get user profile for glass size and weight-based calculations
-        user_profile = await db.user_profile.find_one({})
-        glass_size = user_profile.get("glass_size", 250) if user_profile else 250
-        
-        # Get current weight for daily goal calculation
-        latest_weight_entry = await db.weight_entries.find_one(
-            {"date": {"$lte": date_to_datetime(tracking_date)}},
+@api_router.put("/water-intake/{tracking_date}", response_model=WaterIntake)
+async def update_water_intake(tracking_date: date, update_data: WaterIntakeUpdate):
+    tracking_dt = date_to_datetime(tracking_date)
+    
+    # Get user profile for glass size and current weight for the daily goal
+    user_profile, latest_weight_entry = await asyncio.gather(
+        get_cached_profile(),
+        db.weight_entries.find_one(
+            {"date": {"$lte": tracking_dt}},
+            {"weight": 1, "_id": 0},
             sort=[("date", -1)]
+        ),
+    )
+    glass_size = user_profile.get("glass_size", 250) if user_profile else 250
+    
+    current_weight = latest_weight_entry.get("weight", 70) if latest_weight_entry else 70
+    
+    # Calculate daily goal based on weight and profile
+    daily_goal_ml = calculate_daily_water_need(
+        weight_kg=current_weight,
+        height_cm=user_profile.get("height") if user_profile else None,
+        age=user_profile.get("age") if user_profile else None,
+        activity_level=user_profile.get("activity_level", "medium") if user_profile else "medium"
+    )
+    
+    # Fields not given keep their stored value (or the default for a new day);
+    # total_ml is derived from the resulting values inside the same update
+    new_glasses = update_data.glasses_consumed if update_data.glasses_consumed is not None else {"$ifNull": ["$glasses_consumed", 0]}
+    new_ml_per_glass = update_data.ml_per_glass if update_data.ml_per_glass is not None else {"$ifNull": ["$ml_per_glass", glass_size]}
+    now = datetime.utcnow()
+    new_intake = WaterIntake(date=tracking_date, created_at=now, updated_at=now)
+    
+    updated = await db.water_intake.find_one_and_update(
+        {"date": tracking_dt},
+        [
+            {"$set": {
+                "id": {"$ifNull": ["$id", new_intake.id]},
+                "glasses_consumed": new_glasses,
+                "ml_per_glass": new_ml_per_glass,
+                "daily_goal_ml": daily_goal_ml,
+                "created_at": {"$ifNull": ["$created_at", new_intake.created_at]},
+                "updated_at": now
+            }},
+            {"$set": {"total_ml": {"$multiply": ["$glasses_consumed", "$ml_per_glass"]}}}
+        ],
+        projection={"_id": 0},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return WaterIntake.from_mongo(updated)
+
+@api_router.get("/water-intake/{tracking_date}/status")
+async def get_water_intake_status(tracking_date: date):
+    """Get detailed water intake status including progress and recommendations"""
+    tracking_dt = date_to_datetime(tracking_date)
+    
+    water_intake = await db.water_intake.find_one({"date": tracking_dt}, {"_id": 0})
+    
+    if not water_intake:
+        # Get user profile and current weight for the daily goal calculation
+        user_profile, latest_weight_entry = await asyncio.gather(
+            get_cached_profile(),
+            db.weight_entries.find_one(
+                {"date": {"$lte": tracking_dt}},
+                {"weight": 1, "_id": 0},
+                sort=[("date", -1)]
+            ),
         )
+        glass_size = user_profile.get("glass_size", 250) if user_profile else 250
         
         current_weight = latest_weight_entry.get("weight", 70) if latest_weight_entry else 70
         
-        # Calculate daily goal based on weight and profile
         daily_goal_ml = calculate_daily_water_need(
             weight_kg=current_weight,
             height_cm=user_profile.get("height") if user_profile else None,
@@ -1403,227 +1604,194 @@ async def update_water_intake(date_str: str, update_data: WaterIntakeUpdate):
             activity_level=user_profile.get("activity_level", "medium") if user_profile else "medium"
         )
         
-        existing = await db.water_intake.find_one({"date": date_to_datetime(tracking_date)})
-        
-        if existing:
-            # Update existing
-            new_glasses = update_data.glasses_consumed if update_data.glasses_consumed is not None else existing.get("glasses_consumed", 0)
-            new_ml_per_glass = update_data.ml_per_glass if update_data.ml_per_glass is not None else existing.get("ml_per_glass", glass_size)
-            
-            update_fields = {
-                "glasses_consumed": new_glasses,
-                "ml_per_glass": new_ml_per_glass,
-                "total_ml": new_glasses * new_ml_per_glass,
-                "daily_goal_ml": daily_goal_ml,
-                "updated_at": datetime.utcnow()
-            }
-            
-            await db.water_intake.update_one(
-                {"date": date_to_datetime(tracking_date)},
-                {"$set": update_fields}
-            )
-            
-            updated = await db.water_intake.find_one({"date": date_to_datetime(tracking_date)})
-            return WaterIntake.from_mongo(updated)
-        else:
-            # Create new
-            new_glasses = update_data.glasses_consumed if update_data.glasses_consumed is not None else 0
-            new_ml_per_glass = update_data.ml_per_glass if update_data.ml_per_glass is not None else glass_size
-            
-            water_intake = WaterIntake(
-                date=tracking_date,
-                glasses_consumed=new_glasses,
-                ml_per_glass=new_ml_per_glass,
-                total_ml=new_glasses * new_ml_per_glass,
-                daily_goal_ml=daily_goal_ml
-            )
-            
-            await db.water_intake.insert_one(water_intake.to_mongo())
-            return water_intake
-            
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-@api_router.get("/water-intake/{date_str}/status")
-async def get_water_intake_status(date_str: str):
-    """Get detailed water intake status including progress and recommendations"""
-    try:
-        tracking_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-        
-        water_intake = await db.water_intake.find_one({"date": date_to_datetime(tracking_date)})
-        
-        if not water_intake:
-            # Get user profile for calculations
-            user_profile = await db.user_profile.find_one({})
-            glass_size = user_profile.get("glass_size", 250) if user_profile else 250
-            
-            # Get current weight for daily goal calculation
-            latest_weight_entry = await db.weight_entries.find_one(
-                {"date": {"$lte": date_to_datetime(tracking_date)}},
-                sort=[("date", -1)]
-            )
-            
-            current_weight = latest_weight_entry.get("weight", 70) if latest_weight_entry else 70
-            
-            daily_goal_ml = calculate_daily_water_need(
-                weight_kg=current_weight,
-                height_cm=user_profile.get("height") if user_profile else None,
-                age=user_profile.get("age") if user_profile else None,
-                activity_level=user_profile.get("activity_level", "medium") if user_profile else "medium"
-            )
-            
-            return {
-                "total_ml": 0,
-                "daily_goal_ml": daily_goal_ml,
-                "remaining_ml": daily_goal_ml,
-                "progress_percentage": 0,
-                "glasses_consumed": 0,
-                "ml_per_glass": glass_size,
-                "glasses_needed": daily_goal_ml // glass_size
-            }
-        
-        water_data = WaterIntake.from_mongo(water_intake)
-        remaining_ml = max(0, water_data.daily_goal_ml - water_data.total_ml)
-        progress_percentage = min(100, (water_data.total_ml / water_data.daily_goal_ml) * 100)
-        glasses_needed = max(0, remaining_ml // water_data.ml_per_glass)
-        
         return {
-            "total_ml": water_data.total_ml,
-            "daily_goal_ml": water_data.daily_goal_ml,
-            "remaining_ml": remaining_ml,
-            "progress_percentage": round(progress_percentage, 1),
-            "glasses_consumed": water_data.glasses_consumed,
-            "ml_per_glass": water_data.ml_per_glass,
-            "glasses_needed": glasses_needed
+            "total_ml": 0,
+            "daily_goal_ml": daily_goal_ml,
+            "remaining_ml": daily_goal_ml,
+            "progress_percentage": 0,
+            "glasses_consumed": 0,
+            "ml_per_glass": glass_size,
+            "glasses_needed": daily_goal_ml // glass_size
         }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    
+    water_data = WaterIntake.from_mongo(water_intake)
+    remaining_ml = max(0, water_data.daily_goal_ml - water_data.total_ml)
+    progress_percentage = min(100, (water_data.total_ml / water_data.daily_goal_ml) * 100)
+    glasses_needed = max(0, remaining_ml // water_data.ml_per_glass)
+    
+    return {
+        "total_ml": water_data.total_ml,
+        "daily_goal_ml": water_data.daily_goal_ml,
+        "remaining_ml": remaining_ml,
+        "progress_percentage": round(progress_percentage, 1),
+        "glasses_consumed": water_data.glasses_consumed,
+        "ml_per_glass": water_data.ml_per_glass,
+        "glasses_needed": glasses_needed
+    }
 
 # Achievement Routes
 @api_router.get("/achievements")
 async def get_achievements():
     """Get all achievements with unlock status"""
-    try:
-        achievements = await db.achievements.find({"user_id": "default"}).to_list(1000)
-        if not achievements:
-            # Initialize default achievements
-            await check_and_unlock_achievements(db)
-            achievements = await db.achievements.find({"user_id": "default"}).to_list(1000)
-        
-        return [Achievement(**ach) for ach in achievements]
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    achievements = await db.achievements.find({"user_id": "default"}, {"_id": 0}).to_list(1000)
+    if not achievements:
+        # Initialize default achievements
+        await check_and_unlock_achievements(db)
+        achievements = await db.achievements.find({"user_id": "default"}, {"_id": 0}).to_list(1000)
+    
+    return ORJSONResponse(achievements)
 
 @api_router.get("/user-stats") 
 async def get_user_stats():
     """Get user statistics and progress"""
-    try:
-        user_stats = await db.user_stats.find_one({"user_id": "default"})
-        if not user_stats:
-            stats = UserStats()
-            await db.user_stats.insert_one(stats.dict())
-            return stats
-        
-        return UserStats(**user_stats)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    user_stats = await db.user_stats.find_one({"user_id": "default"}, {"_id": 0})
+    if not user_stats:
+        # Seed the defaults; upserting keeps concurrent first requests from inserting twice
+        user_stats = await db.user_stats.find_one_and_update(
+            {"user_id": "default"},
+            {"$setOnInsert": UserStats().dict()},
+            projection={"_id": 0},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    
+    return UserStats(**user_stats)
 
 # Settings Routes
-@api_router.get("/settings/notifications")
-async def get_notification_settings():
+# Both settings documents share one implementation; the key names the collection
+# and the singleton cache entry, the value holds the defaults seeded on first use
+SETTINGS_DEFAULTS = {
+    "notification_settings": DEFAULT_NOTIFICATION_SETTINGS,
+    "app_settings": DEFAULT_APP_SETTINGS,
+}
+
+async def read_settings(request: Request, kind: str) -> Response:
+    # Seeds the defaults on first use
+    settings = await get_cached_singleton(
+        kind, db[kind], {"user_id": "default"},
+        seed=lambda: new_settings_doc(SETTINGS_DEFAULTS[kind])
+    )
+    
+    # Stored settings were written from the model; return them without re-validating
+    return conditional_json_response(request, settings)
+
+async def update_settings(kind: str, settings: BaseModel) -> ORJSONResponse:
+    new_settings = new_settings_doc(SETTINGS_DEFAULTS[kind])
+    # Only the fields the client sent; an explicit null leaves the stored value alone
+    update_data = settings.model_dump(exclude_unset=True, exclude_none=True)
+    update_data["updated_at"] = new_settings["updated_at"]
+    
+    # Update the given fields, seeding the remaining defaults on first save
+    updated = await write_settings(db[kind], update_data, new_settings)
+    store_singleton(kind, updated)
+    return ORJSONResponse(updated)
+
+@api_router.get("/settings/notifications", responses={200: {"model": NotificationSettings}})
+async def get_notification_settings(request: Request):
     """Get notification settings"""
-    try:
-        settings = await db.notification_settings.find_one({"user_id": "default"})
-        if not settings:
-            default_settings = NotificationSettings()
-            await db.notification_settings.insert_one(default_settings.dict())
-            return default_settings
-        
-        return NotificationSettings(**settings)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return await read_settings(request, "notification_settings")
 
-@api_router.put("/settings/notifications")
+@api_router.put("/settings/notifications", responses={200: {"model": NotificationSettings}})
 async def update_notification_settings(settings: NotificationSettingsUpdate):
     """Update notification settings"""
-    try:
-        existing = await db.notification_settings.find_one({"user_id": "default"})
-        
-        if existing:
-            update_data = {k: v for k, v in settings.dict().items() if v is not None}
-            update_data["updated_at"] = datetime.utcnow()
-            
-            await db.notification_settings.update_one(
-                {"user_id": "default"},
-                {"$set": update_data}
-            )
-        else:
-            new_settings = NotificationSettings(**settings.dict())
-            await db.notification_settings.insert_one(new_settings.dict())
-        
-        updated = await db.notification_settings.find_one({"user_id": "default"})
-        return NotificationSettings(**updated)
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return await update_settings("notification_settings", settings)
 
-@api_router.get("/settings/app")
-async def get_app_settings():
+@api_router.get("/settings/app", responses={200: {"model": AppSettings}})
+async def get_app_settings(request: Request):
     """Get app settings"""
-    try:
-        settings = await db.app_settings.find_one({"user_id": "default"})
-        if not settings:
-            default_settings = AppSettings()
-            await db.app_settings.insert_one(default_settings.dict())
-            return default_settings
-        
-        return AppSettings(**settings)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return await read_settings(request, "app_settings")
 
-@api_router.put("/settings/app")
+@api_router.put("/settings/app", responses={200: {"model": AppSettings}})
 async def update_app_settings(settings: AppSettingsUpdate):
     """Update app settings"""
-    try:
-        existing = await db.app_settings.find_one({"user_id": "default"})
-        
-        if existing:
-            update_data = {k: v for k, v in settings.dict().items() if v is not None}
-            update_data["updated_at"] = datetime.utcnow()
-            
-            await db.app_settings.update_one(
-                {"user_id": "default"},
-                {"$set": update_data}
-            )
-        else:
-            new_settings = AppSettings(**settings.dict())
-            await db.app_settings.insert_one(new_settings.dict())
-        
-        updated = await db.app_settings.find_one({"user_id": "default"})
-        return AppSettings(**updated)
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return await update_settings("app_settings", settings)
 
-# Include the router in the main app
-app.include_router(api_router)
+# Comma-separated list of allowed browser origins; preflight answers are cached for a day
+cors_origins = [origin.strip() for origin in os.environ.get('CORS_ORIGINS', '*').split(',') if origin.strip()]
 
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
-    allow_origins=["*"],
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_origins=cors_origins,
+    allow_methods=["GET", "POST", "PUT", "DELETE"],
+    allow_headers=["Content-Type", "Authorization"],
+    max_age=86400,
 )
 
-# Configure logging
+# Include the router in the main app
+app.include_router(api_router)
+
+# Configure logging; handlers only enqueue records and a listener thread writes them,
+# so logging never blocks the event loop on stderr
+log_queue = queue.SimpleQueue()
+log_listener = QueueListener(log_queue, logging.StreamHandler())
+log_listener.start()
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[QueueHandler(log_queue)]
 )
+logging.getLogger("uvicorn.access").setLevel(logging.WARNING)
+logging.getLogger("asyncio").setLevel(logging.WARNING)
 logger = logging.getLogger(__name__)
 
+@app.exception_handler(Exception)
+async def unhandled_exception_handler(request: Request, exc: Exception):
+    """Turn unexpected errors into a JSON 500 instead of wrapping every route in try/except"""
+    # This runs outside CORSMiddleware, so mirror its headers for browser clients.
+    # Starlette re-raises exc after the response is sent, so the server still logs the traceback.
+    headers = {}
+    origin = request.headers.get("origin")
+    if origin and ("*" in cors_origins or origin in cors_origins):
+        headers = {"Access-Control-Allow-Origin": origin, "Access-Control-Allow-Credentials": "true", "Vary": "Origin"}
+    return ORJSONResponse({"detail": "Internal server error"}, status_code=500, headers=headers)
+
+# Server error code when an index with the same name exists with other options
+INDEX_OPTIONS_CONFLICT = 85
+
+async def create_unique_index(collection, keys):
+    """Create a unique index without failing startup on data from older versions"""
+    if isinstance(keys, str):
+        keys = [(keys, 1)]
+    try:
+        await collection.create_index(keys, unique=True)
+        return
+    except OperationFailure as e:
+        error = e
+    if error.code == INDEX_OPTIONS_CONFLICT:
+        # An earlier version built the same index without unique; rebuild it
+        await collection.drop_index(keys)
+        try:
+            await collection.create_index(keys, unique=True)
+            return
+        except OperationFailure as e:
+            error = e
+    # Most likely duplicates written by the old check-then-insert routes; keep serving
+    # with a plain index until they are cleaned up
+    logger.error("Unique index %s on %s not created: %s", keys, collection.name, error)
+    await collection.create_index(keys)
+
+@app.on_event("startup")
+async def create_indexes():
+    # Daily tracking collections hold one document per date and are range-scanned
+    # by date (streaks, progress); uniqueness also keeps concurrent upserts safe
+    await create_unique_index(db.pill_tracking, "date")
+    await create_unique_index(db.drink_tracking, "date")
+    await create_unique_index(db.water_intake, "date")
+    await create_unique_index(db.weight_entries, "date")
+    # Saved messages are listed newest first, filtered by category or tag
+    await db.saved_chat_messages.create_index([("category", 1), ("created_at", -1)])
+    await db.saved_chat_messages.create_index("tags")
+    await db.weight_goals.create_index([("is_active", 1), ("created_at", -1)])
+    # One document per badge keeps seeding the default achievements idempotent
+    await create_unique_index(db.achievements, [("user_id", 1), ("badge_type", 1)])
+    await db.achievements.create_index([("user_id", 1), ("is_unlocked", 1)])
+    # Per-user singletons; uniqueness keeps the seeding and settings upserts from duplicating them
+    await create_unique_index(db.user_stats, "user_id")
+    await create_unique_index(db.notification_settings, "user_id")
+    await create_unique_index(db.app_settings, "user_id")
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    await client.close()
+    log_listener.stop()
\ No newline at end of file
@@ -0,0 +1,58 @@
+import os
+import sys
+from datetime import date, datetime
+from pathlib import Path
+
+import bson
+import pytest
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "test")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from server import (  # noqa: E402
+    DrinkTracking,
+    GoalType,
+    PillTracking,
+    WaterIntake,
+    WeightEntry,
+    WeightGoal,
+)
+
+# BSON stores datetimes with millisecond precision, so fixed timestamps keep the comparison exact
+NOW = datetime(2026, 10, 15, 8, 30, 0, 123000)
+
+
+def stored(model):
+    """What MongoDB hands back for a document written with to_mongo()"""
+    return bson.decode(bson.encode(model.to_mongo()))
+
+
+@pytest.mark.parametrize("model", [
+    PillTracking(date=date(2026, 10, 15), morning_taken=True, created_at=NOW, updated_at=NOW),
+    DrinkTracking(date=date(2026, 10, 15), drinks={"wasser": 3, "kaffee": 1}, created_at=NOW, updated_at=NOW),
+    WeightEntry(date=date(2026, 10, 15), weight=70.5, created_at=NOW, updated_at=NOW),
+    WeightGoal(
+        goal_type=GoalType.FIXED_WEIGHT, start_weight=80, target_weight=70,
+        start_date=date(2026, 10, 1), target_date=date(2027, 1, 1), created_at=NOW, updated_at=NOW
+    ),
+    WaterIntake(date=date(2026, 10, 15), glasses_consumed=4, ml_per_glass=250, total_ml=1000, created_at=NOW, updated_at=NOW),
+], ids=lambda model: type(model).__name__)
+def test_from_mongo_round_trip(model):
+    restored = type(model).from_mongo(stored(model))
+    assert restored.model_dump() == model.model_dump()
+    assert restored.model_dump_json() == model.model_dump_json()
+
+
+def test_from_mongo_restores_dates():
+    restored = WeightEntry.from_mongo(stored(WeightEntry(date=date(2026, 10, 15), weight=70.5)))
+    assert type(restored.date) is date
+
+
+def test_weight_goal_from_mongo_restores_goal_type():
+    goal = WeightGoal(
+        goal_type=GoalType.PERCENTAGE, start_weight=80, target_percentage=10,
+        start_date=date(2026, 10, 1), target_date=date(2027, 1, 1)
+    )
+    # GoalType is a str enum, so equality alone would not notice a plain string
+    assert type(WeightGoal.from_mongo(stored(goal)).goal_type) is GoalType